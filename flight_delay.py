@@ -1,7 +1,24 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import numpy as np
+from pandas.api.types import union_categoricals
+
+try:
+    import numba
+except ImportError:  # numba opsional; fallback ke numpy
+    numba = None
+
+try:
+    import polars as pl
+except ImportError:  # polars opsional; fallback ke agregasi pandas
+    pl = None
 
 # --- Konfigurasi halaman ---
 st.set_page_config(
@@ -27,48 +44,323 @@ dan **komponen delay terbesar**  guna mendukung pengambilan keputusan yang lebih
 # ===============================================================
 st.subheader("Data Loading & Cleaning")
 
+DATA_PATH = "Flight_delay.csv"  # <-- file di folder yang sama
+delay_cols = ['CarrierDelay', 'WeatherDelay', 'NASDelay', 'SecurityDelay', 'LateAircraftDelay']
+category_cols = ('Airline', 'Origin', 'Dest')
+# jalur chunked membaca kolom ini sebagai string agar chunk yang kosong semua tidak
+# ditebak float oleh parser (dtype= tidak dipakai di engine pyarrow: ia meng-cast ulang
+# semua kolom dan gagal pada kolom integer yang punya sel kosong)
+category_dtypes = {c: 'str' for c in category_cols}
+CHUNKED_READ_BYTES = 256 * 1024 ** 2  # file di atas ukuran ini dibaca per chunk
+CHUNK_ROWS = 500_000
+PARQUET_CACHE_DIR = Path.home() / '.cache' / 'flight_delay'  # df bersih antar sesi/restart
+PARQUET_CACHE_VERSION = 3  # naikkan bila logika clean() berubah
+
+
+def read_flights(path: str) -> pd.DataFrame:
+    """Baca CSV dengan parser multi-thread PyArrow; fallback ke parser default pandas."""
+    try:
+        return pd.read_csv(path, engine='pyarrow')
+    except ImportError:
+        return pd.read_csv(path)
+
+
+if numba is not None:
+    # serial: Streamlit menjalankan script di thread non-main, dan threading layer
+    # paralel numba (tbb/workqueue) bisa hang saat exit atau abort bila dipanggil bersamaan
+    @numba.njit(cache=True, error_model='numpy')
+    def _delay_features(carrier, weather, nas, sec, late, arr, dist, total, ontime, dp100):
+        # satu pass untuk TotalDelayMinutes, OnTime, dan Delay_per_100_miles
+        for i in range(total.size):
+            total[i] = carrier[i] + weather[i] + nas[i] + sec[i] + late[i]
+            ontime[i] = 1 if arr[i] <= 30 else 0
+            dp100[i] = arr[i] / dist[i] * 100.0 if dist[i] > 0 else np.nan
+else:
+    def _delay_features(carrier, weather, nas, sec, late, arr, dist, total, ontime, dp100):
+        np.add(carrier, weather, out=total)
+        for col in (nas, sec, late):
+            np.add(total, col, out=total)
+        ontime[:] = arr <= 30
+        dp100.fill(np.nan)
+        np.divide(arr, dist, out=dp100, where=dist > 0)
+        dp100 *= 100.0
+
+
+def add_delay_features(df: pd.DataFrame) -> None:
+    """Tambahkan TotalDelayMinutes, OnTime, dan Delay_per_100_miles ke df (in place).
+
+    Delay_per_100_miles bernilai NaN bila Distance kosong atau <= 0.
+    """
+    n = len(df)
+    delays = [df[c].to_numpy() for c in delay_cols]
+    # TotalDelayMinutes tetap int64 bila semua kolom delay integer (seperti penjumlahan pandas)
+    total = np.empty(n, dtype=np.result_type(*delays))
+    ontime = np.empty(n, dtype=np.int8)
+    dp100 = np.empty(n, dtype=np.float64)
+    _delay_features(
+        *delays,
+        df['ArrDelay'].to_numpy(dtype=np.float64),
+        df['Distance'].to_numpy(dtype=np.float64),
+        total, ontime, dp100,
+    )
+    df['TotalDelayMinutes'] = total
+    df['OnTime'] = ontime
+    df['Delay_per_100_miles'] = dp100
+
+
+def parse_dates(s: pd.Series) -> pd.Series:
+    """Parse kolom 'dd-mm-yyyy' (errors='coerce') dengan mem-parse tiap string unik sekali saja.
+
+    Jumlah tanggal unik jauh lebih kecil dari jumlah baris (satu per hari), jadi
+    hasil parse cukup di-take kembali lewat kode factorize; NaN/None -> NaT.
+    """
+    codes, uniques = pd.factorize(s)
+    parsed = pd.to_datetime(uniques, format='%d-%m-%Y', errors='coerce')
+    return pd.Series(parsed.array.take(codes, allow_fill=True), index=s.index, name=s.name)
+
+
+def clean(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse tanggal, koersi numerik, isi NaN, dan feature engineering (in place)."""
+    df['Date'] = parse_dates(df['Date'])
+    numeric_cols = [
+        'DepTime', 'ArrTime', 'CRSArrTime', 'ActualElapsedTime', 'CRSElapsedTime',
+        'AirTime', 'ArrDelay', 'Distance', 'TaxiIn', 'TaxiOut',
+        'CarrierDelay', 'WeatherDelay', 'NASDelay', 'SecurityDelay', 'LateAircraftDelay'
+    ]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+
+    # --- Isi NaN delay dengan 0 dalam satu pass numpy ---
+    # kolom integer tidak mungkin berisi NaN, jadi hanya kolom float yang diproses
+    fill_cols = [c for c in delay_cols + ['ArrDelay'] if df[c].dtype.kind == 'f']
+    if fill_cols:
+        block = df[fill_cols].to_numpy(copy=True)
+        np.copyto(block, 0.0, where=np.isnan(block))
+        df[fill_cols] = block
+
+    # --- Feature Engineering ---
+    add_delay_features(df)
+    # Bulan dari epoch bulanan (datetime64[M]); NaT tetap NaN seperti .dt.month
+    dates = df['Date'].values
+    month = (dates.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int32)
+    nat = np.isnat(dates)
+    df['Month'] = np.where(nat, np.nan, month) if nat.any() else month
+
+    # --- Kolom kategori berkardinalitas rendah (isin/groupby via kode integer) ---
+    for c in category_cols:
+        df[c] = df[c].astype('category')
+    return df
+
+
+def load_chunked(path: str, chunksize: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Baca dan bersihkan CSV per chunk agar file besar tidak perlu dimuat mentah sekaligus."""
+    parts = [clean(chunk) for chunk in pd.read_csv(path, chunksize=chunksize, dtype=category_dtypes)]
+    # samakan kategori antar chunk supaya concat tetap bertipe category
+    for c in category_cols:
+        categories = union_categoricals([p[c] for p in parts], sort_categories=True).categories
+        for p in parts:
+            p[c] = p[c].cat.set_categories(categories)
+    return pd.concat(parts, ignore_index=True)
+
+
+def parquet_cache_path(path: str) -> Path:
+    """Lokasi cache Parquet untuk isi file CSV (sha1 dari byte file + versi cache)."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return PARQUET_CACHE_DIR / f"{digest.hexdigest()}-v{PARQUET_CACHE_VERSION}.parquet"
+
+
+def write_parquet_cache(df: pd.DataFrame, cache_path: Path) -> None:
+    """Simpan df bersih ke cache Parquet; gagal menulis cache tidak menghentikan app."""
+    tmp_path = None
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # nama temp unik agar dua proses cold start tidak menulis file yang sama
+        with tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix='.tmp', delete=False) as tmp:
+            tmp_path = Path(tmp.name)
+        df.to_parquet(tmp_path, engine='pyarrow', compression='zstd')
+        os.replace(tmp_path, cache_path)
+        # hapus cache versi lama untuk CSV yang sama
+        digest = cache_path.name.rsplit('-v', 1)[0]
+        for old in cache_path.parent.glob(f"{digest}-v*.parquet"):
+            if old != cache_path:
+                old.unlink(missing_ok=True)
+    except Exception:
+        # ImportError/OSError, maupun ArrowInvalid/ArrowTypeError (ValueError/TypeError)
+        # untuk kolom object campuran dari jalur chunked
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+
+
+def read_parquet_cache(cache_path: Path):
+    """Baca cache Parquet; file yang tidak bisa dibaca dihapus dan dianggap cache miss (None)."""
+    if not cache_path.exists():
+        return None
+    try:
+        return pd.read_parquet(cache_path, engine='pyarrow')
+    except Exception:
+        # file rusak/terpotong atau dari versi pyarrow yang tidak kompatibel
+        cache_path.unlink(missing_ok=True)
+        return None
+
+
+@st.cache_data(show_spinner=False)
+def load_and_clean(path: str, mtime: float):
+    """Muat data bersih + anomali; hasil di-cache per file (path + mtime)."""
+    cache_path = parquet_cache_path(path)
+    df = read_parquet_cache(cache_path)
+    if df is None:
+        if os.path.getsize(path) > CHUNKED_READ_BYTES:
+            df = load_chunked(path)
+        else:
+            df = clean(read_flights(path))
+        write_parquet_cache(df, cache_path)
+
+    # --- Anomali menggunakan IQR ---
+    arr_delay = df['ArrDelay'].to_numpy()
+    q1, q3 = np.quantile(arr_delay, [0.25, 0.75])
+    iqr = q3 - q1
+    upper_limit = q3 + 1.5 * iqr
+    anomalies = df[arr_delay > upper_limit]
+    return df, anomalies
+
+
+def filter_flights(df, date_range, carriers, origins, dests):
+    """Terapkan filter sidebar ke df dengan satu boolean mask gabungan.
+
+    Tanpa filter aktif, df dikembalikan apa adanya (tanpa copy).
+    """
+    if not (len(date_range) == 2 or carriers or origins or dests):
+        return df
+
+    mask = np.ones(len(df), dtype=bool)
+    if len(date_range) == 2:
+        dates = df['Date'].values
+        mask &= (dates >= np.datetime64(date_range[0])) & (dates <= np.datetime64(date_range[1]))
+    if carriers:
+        mask &= df['Airline'].isin(carriers).values
+    if origins:
+        mask &= df['Origin'].isin(origins).values
+    if dests:
+        mask &= df['Dest'].isin(dests).values
+    return df.loc[mask]
+
+
+@st.cache_resource(show_spinner=False)
+def polars_frame(_df, data_key):
+    """Salinan Polars dari df bersih, dibuat sekali per file data dan dipakai bersama antar sesi.
+
+    Hanya kolom yang dipakai agregasi yang dikonversi; kolom object lain (mis. TailNum
+    campuran int/str dari jalur chunked) tidak selalu bisa dikonversi ke Arrow.
+    """
+    cols = ['Date', *category_cols, 'Month', 'ArrDelay', 'OnTime', 'Distance', *delay_cols]
+    return pl.from_pandas(_df[cols])
+
+
+def compute_aggs_polars(pl_df, date_range, carriers, origins, dests):
+    """Versi Polars dari compute_aggs: filter sekali, lalu semua agregasi paralel lewat collect_all."""
+    predicates = []
+    if len(date_range) == 2:
+        predicates.append(pl.col('Date').is_between(
+            pd.Timestamp(date_range[0]).to_pydatetime(), pd.Timestamp(date_range[1]).to_pydatetime()
+        ))
+    for col, values in (('Airline', carriers), ('Origin', origins), ('Dest', dests)):
+        if values:
+            predicates.append(pl.col(col).cast(pl.Utf8).is_in(list(values)))
+    filtered = pl_df.filter(pl.all_horizontal(predicates)) if predicates else pl_df
+    if filtered.height == 0:
+        return None
+    lf = filtered.lazy()
+
+    def mean_by(*keys):
+        # seperti groupby pandas: kunci null dibuang, kunci kategori dikembalikan sebagai string
+        return (
+            lf.drop_nulls(list(keys))
+            .group_by(list(keys))
+            .agg(pl.col('ArrDelay').mean())
+            .with_columns(pl.col(k).cast(pl.Utf8) for k in keys if k != 'Month')
+        )
+
+    kpis, delay_sum, by_airline, by_month, by_route = pl.collect_all([
+        lf.select(
+            pl.len().alias('total_flights'),
+            # mean() Polars bernilai null bila semua baris kosong; samakan dengan NaN pandas
+            pl.col('ArrDelay').mean().fill_null(float('nan')).alias('avg_delay'),
+            (pl.col('OnTime').mean() * 100).fill_null(float('nan')).alias('pct_ontime'),
+            pl.col('Distance').mean().fill_null(float('nan')).alias('avg_distance'),
+        ),
+        lf.select(pl.col(delay_cols).sum()),
+        mean_by('Airline').sort('ArrDelay', descending=True),
+        mean_by('Month').sort('Month'),
+        mean_by('Dest', 'Origin'),
+    ])
+    kpis = kpis.row(0, named=True)
+
+    delay_sum = delay_sum.to_pandas().T.reset_index()
+    delay_sum.columns = ['DelayType', 'TotalMinutes']
+    return {
+        'kpis': kpis,
+        'by_airline': by_airline.to_pandas(),
+        'by_month': by_month.to_pandas(),
+        'delay_sum': delay_sum,
+        'by_route': by_route.to_pandas().set_index(['Dest', 'Origin'])['ArrDelay'].unstack('Origin'),
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def compute_aggs(_df, data_key, date_range, carriers, origins, dests) -> dict:
+    """Filter sekali lalu hitung semua KPI dan agregasi chart; di-cache per kombinasi filter.
+
+    `_df` tidak di-hash oleh Streamlit; `data_key` (mtime file) yang mewakili isi data.
+    Mengembalikan None bila tidak ada baris yang lolos filter. Memakai Polars bila terpasang.
+    """
+    if pl is not None:
+        return compute_aggs_polars(polars_frame(_df, data_key), date_range, carriers, origins, dests)
+
+    filtered = filter_flights(_df, date_range, carriers, origins, dests)
+    if filtered.empty:
+        return None
+
+    kpis = filtered[['ArrDelay', 'OnTime', 'Distance']].mean()
+    delay_sum = filtered[delay_cols].sum().reset_index()
+    delay_sum.columns = ['DelayType', 'TotalMinutes']
+    return {
+        'kpis': {
+            'total_flights': filtered.shape[0],
+            'avg_delay': kpis['ArrDelay'],
+            'pct_ontime': kpis['OnTime'] * 100,
+            'avg_distance': kpis['Distance'],
+        },
+        'by_airline': (
+            filtered.groupby('Airline', observed=True)['ArrDelay'].mean().reset_index().sort_values(by='ArrDelay', ascending=False)
+        ),
+        'by_month': filtered.groupby('Month')['ArrDelay'].mean().reset_index(),
+        'delay_sum': delay_sum,
+        'by_route': filtered.groupby(['Dest', 'Origin'], observed=True)['ArrDelay'].mean().unstack('Origin'),
+    }
+
+
+@st.cache_data(show_spinner=False)
+def sidebar_options(_df, data_key) -> dict:
+    """Rentang tanggal dan daftar pilihan filter; dihitung sekali per file data."""
+    return {
+        'min_date': _df['Date'].min(),
+        'max_date': _df['Date'].max(),
+        'has_nat': bool(_df['Date'].isna().any()),
+        'airlines': _df['Airline'].cat.categories.tolist(),
+        'origins': _df['Origin'].cat.categories.tolist(),
+        'dests': _df['Dest'].cat.categories.tolist(),
+    }
+
+
 try:
-    df = pd.read_csv("Flight_delay.csv")  # <-- file di folder yang sama
+    data_mtime = os.path.getmtime(DATA_PATH)
+    df, anomalies = load_and_clean(DATA_PATH, data_mtime)
 except FileNotFoundError:
     st.error("❌ File 'Flight_delay.csv' tidak ditemukan di folder utama repo GitHub kamu.")
     st.stop()
 
-# --- lanjut ke preprocessing seperti biasa ---
-df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce')
-numeric_cols = [
-    'DepTime', 'ArrTime', 'CRSArrTime', 'ActualElapsedTime', 'CRSElapsedTime',
-    'AirTime', 'ArrDelay', 'Distance', 'TaxiIn', 'TaxiOut',
-    'CarrierDelay', 'WeatherDelay', 'NASDelay', 'SecurityDelay', 'LateAircraftDelay'
-]
-for col in numeric_cols:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-df.fillna({
-    'CarrierDelay': 0,
-    'WeatherDelay': 0,
-    'NASDelay': 0,
-    'SecurityDelay': 0,
-    'LateAircraftDelay': 0,
-    'ArrDelay': 0
-}, inplace=True)
-
-df['TotalDelayMinutes'] = df['CarrierDelay'] + df['WeatherDelay'] + df['NASDelay'] + df['SecurityDelay'] + df['LateAircraftDelay']
-df['OnTime'] = np.where(df['ArrDelay'] <= 30, 1, 0)
-df['Delay_per_100_miles'] = (df['ArrDelay'] / df['Distance']) * 100
-df['Month'] = df['Date'].dt.month
-
-   # --- Feature Engineering ---
-df['TotalDelayMinutes'] = df['CarrierDelay'] + df['WeatherDelay'] + df['NASDelay'] + df['SecurityDelay'] + df['LateAircraftDelay']
-df['OnTime'] = np.where(df['ArrDelay'] <= 30, 1, 0)
-df['Delay_per_100_miles'] = (df['ArrDelay'] / df['Distance']) * 100
-df['Month'] = df['Date'].dt.month
-
-# --- Anomali menggunakan IQR ---
-q1, q3 = df['ArrDelay'].quantile([0.25, 0.75])
-iqr = q3 - q1
-upper_limit = q3 + 1.5 * iqr
-anomalies = df[df['ArrDelay'] > upper_limit]
-
 # --- Tampilkan info dasar ---
 st.write("**Jumlah baris:**", df.shape[0])
 st.write("**Jumlah kolom:**", df.shape[1])
@@ -89,33 +381,42 @@ st.markdown("""
 # SIDEBAR FILTER
 # ===============================================================
 st.sidebar.header("Filter Data")
-min_date, max_date = df['Date'].min(), df['Date'].max()
+opts = sidebar_options(df, data_mtime)
+min_date, max_date = opts['min_date'], opts['max_date']
 date_range = st.sidebar.date_input("Rentang tanggal", [min_date, max_date])
-selected_carriers = st.sidebar.multiselect("Pilih Maskapai", sorted(df['Airline'].unique()))
-selected_origin = st.sidebar.multiselect("Bandara Asal", sorted(df['Origin'].unique()))
-selected_dest = st.sidebar.multiselect("Bandara Tujuan", sorted(df['Dest'].unique()))
-
-# Filter data
-filtered = df.copy()
-if len(date_range) == 2:
-    filtered = filtered[(filtered['Date'] >= pd.to_datetime(date_range[0])) &
-                        (filtered['Date'] <= pd.to_datetime(date_range[1]))]
-if selected_carriers:
-    filtered = filtered[filtered['Airline'].isin(selected_carriers)]
-if selected_origin:
-    filtered = filtered[filtered['Origin'].isin(selected_origin)]
-if selected_dest:
-    filtered = filtered[filtered['Dest'].isin(selected_dest)]
+selected_carriers = st.sidebar.multiselect("Pilih Maskapai", opts['airlines'])
+selected_origin = st.sidebar.multiselect("Bandara Asal", opts['origins'])
+selected_dest = st.sidebar.multiselect("Bandara Tujuan", opts['dests'])
+
+# Rentang tanggal yang mencakup seluruh data tidak perlu difilter
+# (kecuali ada tanggal NaT yang memang harus dibuang oleh filter tanggal)
+date_key = tuple(date_range)
+if (len(date_key) == 2 and not opts['has_nat']
+        and pd.Timestamp(date_key[0]) <= min_date and pd.Timestamp(date_key[1]) >= max_date):
+    date_key = ()
+
+# Filter data + agregasi (di-cache per kombinasi filter)
+aggs = compute_aggs(
+    df, data_mtime,
+    date_key,
+    tuple(sorted(selected_carriers)),
+    tuple(sorted(selected_origin)),
+    tuple(sorted(selected_dest)),
+)
+if aggs is None:
+    st.info("Tidak ada penerbangan yang cocok dengan filter.")
+    st.stop()
 
 # ===============================================================
 # KPI SECTION (Metrik Baru)
 # ===============================================================
 st.subheader("Key Performance Indicators (KPI)")
 
-avg_delay = filtered['ArrDelay'].mean()
-pct_ontime = filtered['OnTime'].mean() * 100
-avg_distance = filtered['Distance'].mean()
-total_flights = filtered.shape[0]
+kpis = aggs['kpis']
+avg_delay = kpis['avg_delay']
+pct_ontime = kpis['pct_ontime']
+avg_distance = kpis['avg_distance']
+total_flights = kpis['total_flights']
 
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Total Flights", f"{total_flights:,}")
@@ -134,9 +435,7 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.markdown("### Rata-rata Delay per Maskapai")
-    avg_delay_airline = (
-        filtered.groupby('Airline')['ArrDelay'].mean().reset_index().sort_values(by='ArrDelay', ascending=False)
-    )
+    avg_delay_airline = aggs['by_airline']
     fig_bar = px.bar(
         avg_delay_airline,
         x='Airline', y='ArrDelay',
@@ -148,8 +447,12 @@ with col1:
 
 with col2:
     st.markdown("### Tren Keterlambatan per Bulan")
-    trend = filtered.groupby('Month')['ArrDelay'].mean().reset_index()
-    fig_line = px.line(trend, x='Month', y='ArrDelay', markers=True, title="Rata-rata Delay Bulanan")
+    trend = aggs['by_month']
+    fig_line = go.Figure(go.Scattergl(x=trend['Month'], y=trend['ArrDelay'], mode='lines+markers'))
+    fig_line.update_layout(
+        template=px.defaults.template, title="Rata-rata Delay Bulanan",
+        xaxis_title='Month', yaxis_title='ArrDelay'
+    )
     st.plotly_chart(fig_line, use_container_width=True)
 
 
@@ -158,17 +461,16 @@ col3, col4 = st.columns(2)
 
 with col3:
     st.markdown("### Komposisi Jenis Delay")
-    delay_cols = ['CarrierDelay', 'WeatherDelay', 'NASDelay', 'SecurityDelay', 'LateAircraftDelay']
-    delay_sum = filtered[delay_cols].sum().reset_index()
-    delay_sum.columns = ['DelayType', 'TotalMinutes']
+    delay_sum = aggs['delay_sum']
     fig_pie = px.pie(delay_sum, names='DelayType', values='TotalMinutes', title="Proporsi Delay Berdasarkan Penyebab")
     st.plotly_chart(fig_pie, use_container_width=True)
 
 with col4:
     st.markdown("### Heatmap Rata-rata Delay (Origin vs Destination)")
-    heat = filtered.groupby(['Origin', 'Dest'])['ArrDelay'].mean().reset_index()
-    fig_heat = px.density_heatmap(
-        heat, x='Origin', y='Dest', z='ArrDelay', color_continuous_scale='Viridis',
+    heat = aggs['by_route']
+    fig_heat = px.imshow(
+        heat, color_continuous_scale='Viridis', aspect='auto',
+        labels={'x': 'Origin', 'y': 'Dest', 'color': 'ArrDelay'},
         title="Rata-rata Delay berdasarkan Rute"
     )
     st.plotly_chart(fig_heat, use_container_width=True)